@@ -56,6 +56,7 @@ deploy_shopping_app() {
     echo "  GET  /api/products/{id}   - Get product details"
     echo "  GET  /api/cart/{user_id}  - Get user's cart"
     echo "  POST /api/cart/{user_id}/add - Add to cart"
+    echo "  POST /api/cart/{user_id}/add_bulk - Add several items to cart"
     echo "  POST /api/checkout        - Process checkout"
     echo ""
 }
@@ -5,17 +5,25 @@ Replaces the basic sample web app for SRE Agent demo
 """
 
 import os
-import json
 import time
+import array
 import random
+import asyncio
+import atexit
 import logging
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-from datetime import datetime
+import itertools
+import functools
+import logging.handlers
+import queue
 from pathlib import Path
+from urllib.parse import unquote_plus
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
-logger = logging.getLogger('shopping-app')
+import orjson
+import redis.asyncio as aioredis
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
 
 # Configuration from environment
 BASE_LATENCY = int(os.getenv('BASE_LATENCY_MS', '50')) / 1000
@@ -26,6 +34,56 @@ DB_FAILURE_RATE = float(os.getenv('DB_FAILURE_RATE', '0.05'))
 PAYMENT_FAILURE_RATE = float(os.getenv('PAYMENT_FAILURE_RATE', '0.10'))
 CHAOS_MODE = os.getenv('CHAOS_MODE', 'false').lower() == 'true'
 CHAOS_MULTIPLIER = int(os.getenv('CHAOS_LATENCY_MULTIPLIER', '10'))
+# Keep idle connections from the App Gateway open longer than uvicorn's 5s default
+KEEP_ALIVE_TIMEOUT = int(os.getenv('KEEP_ALIVE_TIMEOUT_S', '75'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Keep 1 in N records below WARNING (1 = log every request)
+LOG_SAMPLE_RATE = int(os.getenv('LOG_SAMPLE_RATE', '1'))
+# Carts live in this process unless REDIS_HOST points at a shared store
+REDIS_HOST = os.getenv('REDIS_HOST')
+REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
+CART_TTL = int(os.getenv('CART_TTL_S', '86400'))
+WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+
+class LogSampler(logging.Filter):
+    """Pass one in every `rate` records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.counter = itertools.count()
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or next(self.counter) % self.rate == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as-is so %-formatting also happens on the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+# Request handlers only enqueue log records; a listener thread formats them
+# and writes them to stderr
+log_queue = queue.SimpleQueue()
+queue_handler = DeferredQueueHandler(log_queue)
+if LOG_SAMPLE_RATE > 1:
+    queue_handler.addFilter(LogSampler(LOG_SAMPLE_RATE))
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+logger = logging.getLogger('shopping-app')
+
+# Static file directory
+STATIC_DIR = Path(__file__).parent / 'static'
+# The frontend is baked into the image, so read it once and serve it from memory
+INDEX_FILE = STATIC_DIR / 'index.html'
+INDEX_HTML = INDEX_FILE.read_bytes() if INDEX_FILE.exists() else None
 
 # Sample product catalog
 PRODUCTS = [
@@ -41,213 +99,503 @@ PRODUCTS = [
     {"id": 10, "name": "Ergonomic Chair", "price": 299.99, "category": "furniture"},
 ]
 
-# In-memory cart storage
-carts = {}
-
-
-def simulate_latency(base_latency):
+# Catalog is immutable, so its derived responses are built once at import
+CATEGORIES = sorted({p['category'] for p in PRODUCTS})
+CATEGORIES_JSON = orjson.dumps({"categories": CATEGORIES})
+PRODUCTS_BY_ID = {p['id']: p for p in PRODUCTS}
+PRODUCTS_BY_CATEGORY = {}
+for p in PRODUCTS:
+    PRODUCTS_BY_CATEGORY.setdefault(p['category'], []).append(p)
+PRODUCT_JSON_BY_ID = {p['id']: orjson.dumps(p) for p in PRODUCTS}
+# Cart totals are kept in integer cents so repeated adds do not drift
+PRICE_CENTS = {p['id']: int(round(p['price'] * 100)) for p in PRODUCTS}
+MAX_QUANTITY = 1000
+PRODUCT_NOT_FOUND_JSON = orjson.dumps({"error": "Product not found"})
+
+# Fixed-shape response templates; only the %s slots vary per request
+HEALTH_TEMPLATE = (
+    b'{"status":"healthy","service":"shopping-app","version":"1.0.0","timestamp":"%s","chaos_mode":'
+    + (b'true' if CHAOS_MODE else b'false') + b'}'
+)
+NOT_FOUND_TEMPLATE = b'{"error":"Not found","path":%s}'
+NOT_FOUND_JSON = b'{"error":"Not found"}'
+ERROR_TEMPLATE = b'{"error":%s,"status":"error"}'
+CHECKOUT_TEMPLATE = b'{"order_id":"ORD-%d","status":"confirmed","total":%s,"items_count":%d}'
+BULK_NOT_FOUND_TEMPLATE = b'{"error":"Product not found","missing":%s}'
+CART_EMPTY_JSON = b'{"error":"Cart is empty"}'
+INVALID_CART_OPERATION_JSON = b'{"error":"Invalid cart operation"}'
+NO_ITEMS_JSON = b'{"error":"No items to add"}'
+INVALID_ITEMS_JSON = b'{"error":"Each item must be an object with an integer product_id"}'
+INVALID_QUANTITY_JSON = b'{"error":"Quantity must be an integer from 1 to 1000"}'
+DB_FAILED_JSON = b'{"error":"Database connection failed","status":"error"}'
+PAYMENT_FAILED_JSON = b'{"error":"Payment processing failed","status":"error"}'
+_ts_cache = [0, b'']
+
+# Carts store only product ids and quantities; they are joined against
+# PRODUCTS_BY_ID when serialized
+EMPTY_CART_JSON = orjson.dumps({"items": [], "total": 0})
+CART_TEMPLATE = b'{"items":%s,"total":%s}'
+
+# Precomputed random draws, cycled through instead of calling random per request
+DEVIATE_MASK = 4095
+_JITTER = array.array('d', [random.uniform(-0.2, 0.2) for _ in range(DEVIATE_MASK + 1)])
+_JITTER_IDX = itertools.count()
+_FAILURE_ROLLS = array.array('d', [random.random() for _ in range(DEVIATE_MASK + 1)])
+_FAILURE_ROLL_IDX = itertools.count()
+
+
+async def simulate_latency(base_latency):
     latency = base_latency
     if CHAOS_MODE:
         latency *= CHAOS_MULTIPLIER
     # Add jitter (±20%)
-    jitter = latency * random.uniform(-0.2, 0.2)
+    jitter = latency * _JITTER[next(_JITTER_IDX) & DEVIATE_MASK]
     actual_latency = latency + jitter
-    time.sleep(actual_latency)
+    await asyncio.sleep(actual_latency)
     return actual_latency
 
 
 def simulate_db_call():
-    if random.random() < DB_FAILURE_RATE:
+    """Return False on a simulated database failure"""
+    if _FAILURE_ROLLS[next(_FAILURE_ROLL_IDX) & DEVIATE_MASK] < DB_FAILURE_RATE:
         logger.error("ERROR: Database connection timeout after 30s")
-        raise Exception("Database connection failed")
+        return False
     return True
 
 
 def simulate_payment():
-    if random.random() < PAYMENT_FAILURE_RATE:
+    """Return False on a simulated payment gateway failure"""
+    if _FAILURE_ROLLS[next(_FAILURE_ROLL_IDX) & DEVIATE_MASK] < PAYMENT_FAILURE_RATE:
         logger.error("ERROR: Payment gateway timeout - transaction failed")
-        raise Exception("Payment processing failed")
+        return False
     return True
 
 
-class ShoppingHandler(BaseHTTPRequestHandler):
-    # Static file directory
-    STATIC_DIR = Path(__file__).parent / 'static'
-    
-    def send_json(self, data, status=200):
-        self.send_response(status)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('X-Response-Time', str(self.response_time))
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
-
-    def send_static(self, filepath, content_type):
-        """Serve static files"""
-        try:
-            with open(filepath, 'rb') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', content_type)
-            self.send_header('Content-Length', len(content))
-            self.end_headers()
-            self.wfile.write(content)
-        except FileNotFoundError:
-            self.send_error(404, 'File not found')
-
-    def do_OPTIONS(self):
-        """Handle CORS preflight requests"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-
-    def do_GET(self):
+def utc_timestamp():
+    """Current UTC time as ISO-8601 bytes, formatted at most once per second"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[:] = [now, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)).encode()]
+    return _ts_cache[1]
+
+
+def encode_cart(lines, total_cents):
+    """Serialize (product_id, quantity) lines and a total in the external cart shape"""
+    items = [{"product": PRODUCTS_BY_ID[pid], "quantity": quantity} for pid, quantity in lines]
+    return CART_TEMPLATE % (orjson.dumps(items), format_cents(total_cents))
+
+
+class MemoryCartStore:
+    """Carts held in this process.
+
+    Only the event loop thread touches them and no read-modify-write spans an
+    await, so no locking is needed. Each cart keeps parallel product_ids and
+    quantities lists and caches its encoded body until the next write.
+    """
+
+    def __init__(self):
+        self.carts = {}
+
+    async def get(self, user_id):
+        cart = self.carts.get(user_id)
+        return self._encode(cart) if cart else EMPTY_CART_JSON
+
+    async def add(self, user_id, lines):
+        """Append (product, quantity) lines to a user's cart and return its encoded body"""
+        cart = self.carts.get(user_id)
+        if cart is None:
+            cart = self.carts[user_id] = {"product_ids": [], "quantities": [], "total_cents": 0, "json": None}
+        for product, quantity in lines:
+            cart["product_ids"].append(product["id"])
+            cart["quantities"].append(quantity)
+            cart["total_cents"] += PRICE_CENTS[product["id"]] * quantity
+        cart["json"] = None
+        return self._encode(cart)
+
+    async def checkout(self, user_id):
+        """Remove a user's cart and return (items_count, total_cents), or None if it was empty"""
+        cart = self.carts.pop(user_id, None)
+        if not cart or not cart["product_ids"]:
+            return None
+        return len(cart["product_ids"]), cart["total_cents"]
+
+    def _encode(self, cart):
+        if cart["json"] is None:
+            cart["json"] = encode_cart(zip(cart["product_ids"], cart["quantities"]), cart["total_cents"])
+        return cart["json"]
+
+
+class RedisCartStore:
+    """Carts shared by every worker process through Redis.
+
+    A cart is a list of [product_id, quantity] entries plus a total in cents.
+    Each operation runs as one MULTI/EXEC transaction, so concurrent workers
+    cannot interleave with it. MULTI/EXEC does not roll back when a command
+    fails, so add() must only receive lines with validated integer quantities
+    (see valid_quantity); otherwise INCRBY could fail after RPUSH applied.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _keys(user_id):
+        return f'cart:{user_id}:items', f'cart:{user_id}:total'
+
+    async def get(self, user_id):
+        items_key, total_key = self._keys(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lrange(items_key, 0, -1)
+            pipe.get(total_key)
+            entries, total_cents = await pipe.execute()
+        if not entries:
+            return EMPTY_CART_JSON
+        return encode_cart(map(orjson.loads, entries), int(total_cents or 0))
+
+    async def add(self, user_id, lines):
+        """Append validated (product, quantity) lines to a user's cart and return its encoded body"""
+        items_key, total_key = self._keys(user_id)
+        added_cents = sum(PRICE_CENTS[product["id"]] * quantity for product, quantity in lines)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(items_key, *[orjson.dumps([product["id"], quantity]) for product, quantity in lines])
+            pipe.incrby(total_key, added_cents)
+            pipe.expire(items_key, CART_TTL)
+            pipe.expire(total_key, CART_TTL)
+            pipe.lrange(items_key, 0, -1)
+            _, total_cents, _, _, entries = await pipe.execute()
+        return encode_cart(map(orjson.loads, entries), total_cents)
+
+    async def checkout(self, user_id):
+        """Remove a user's cart and return (items_count, total_cents), or None if it was empty"""
+        items_key, total_key = self._keys(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.llen(items_key)
+            pipe.get(total_key)
+            pipe.delete(items_key, total_key)
+            items_count, total_cents, _ = await pipe.execute()
+        if not items_count:
+            return None
+        return items_count, int(total_cents or 0)
+
+
+if REDIS_HOST:
+    CART_STORE = RedisCartStore(aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT))
+else:
+    CART_STORE = MemoryCartStore()
+
+
+def valid_quantity(quantity):
+    """Quantities must be plain ints so cart totals stay integer cents"""
+    return isinstance(quantity, int) and not isinstance(quantity, bool) and 1 <= quantity <= MAX_QUANTITY
+
+
+def format_cents(cents):
+    """Render integer cents as a JSON number with two decimals"""
+    whole, fraction = divmod(abs(cents), 100)
+    return b'%s%d.%02d' % (b'-' if cents < 0 else b'', whole, fraction)
+
+
+@functools.lru_cache(maxsize=1024)
+def encode_products_response(category):
+    """Return (count, body) for a product listing; safe to cache since PRODUCTS never changes"""
+    products = PRODUCTS_BY_CATEGORY.get(category, []) if category else PRODUCTS
+    return len(products), orjson.dumps({"products": products, "count": len(products)})
+
+
+def get_category(query_string):
+    """Return the first non-blank category value from a raw query string by slicing, not splitting"""
+    start = query_string.find(b'category=')
+    while start >= 0:
+        value_start = start + 9
+        end = query_string.find(b'&', value_start)
+        if end < 0:
+            end = len(query_string)
+        # Skip matches inside another pair (subcategory=, x=category=) and,
+        # like parse_qs, blank values
+        if end > value_start and (start == 0 or query_string[start - 1:start] == b'&'):
+            return unquote_plus(query_string[value_start:end].decode('latin-1'))
+        start = query_string.find(b'category=', value_start)
+    return None
+
+
+# Header tuples shared by every JSON response
+JSON_HEADERS = [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]
+
+
+class JSONBytesResponse(Response):
+    """Already-encoded JSON body whose fixed headers are reused rather than re-encoded"""
+    media_type = 'application/json'
+
+    def __init__(self, body, response_time, status=200):
+        self.response_time = response_time
+        super().__init__(body, status)
+
+    def init_headers(self, headers=None):
+        self.raw_headers = JSON_HEADERS + [
+            (b'content-length', b'%d' % len(self.body)),
+            (b'x-response-time', str(self.response_time).encode()),
+        ]
+
+
+def send_json_bytes(body, response_time, status=200):
+    """Send an already-encoded JSON body"""
+    return JSONBytesResponse(body, response_time, status)
+
+
+async def read_json(request):
+    body = await request.body()
+    return orjson.loads(body) if body else {}
+
+
+def handle_errors(endpoint):
+    """Turn unexpected endpoint errors into a JSON 500 response"""
+    @functools.wraps(endpoint)
+    async def wrapper(request, *params):
         start_time = time.time()
-        parsed = urlparse(self.path)
-        path = parsed.path
-        query = parse_qs(parsed.query)
-
         try:
-            # Serve frontend
-            if path == '/':
-                index_file = self.STATIC_DIR / 'index.html'
-                if index_file.exists():
-                    self.send_static(index_file, 'text/html')
-                    return
-                # Fallback to health if no frontend
-                self.response_time = simulate_latency(BASE_LATENCY)
-                self.send_json({
-                    "status": "healthy",
-                    "service": "shopping-app",
-                    "version": "1.0.0",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "chaos_mode": CHAOS_MODE
-                })
-
-            elif path == '/health':
-                self.response_time = simulate_latency(BASE_LATENCY)
-                self.send_json({
-                    "status": "healthy",
-                    "service": "shopping-app",
-                    "version": "1.0.0",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "chaos_mode": CHAOS_MODE
-                })
-
-            elif path == '/api/products':
-                self.response_time = simulate_latency(PRODUCT_LATENCY)
-                simulate_db_call()
-                category = query.get('category', [None])[0]
-                products = PRODUCTS
-                if category:
-                    products = [p for p in PRODUCTS if p['category'] == category]
-                logger.info(f"Retrieved {len(products)} products")
-                self.send_json({"products": products, "count": len(products)})
-
-            elif path.startswith('/api/products/'):
-                self.response_time = simulate_latency(PRODUCT_LATENCY)
-                simulate_db_call()
-                product_id = int(path.split('/')[-1])
-                product = next((p for p in PRODUCTS if p['id'] == product_id), None)
-                if product:
-                    logger.info(f"Retrieved product {product_id}")
-                    self.send_json(product)
-                else:
-                    logger.warning(f"Product {product_id} not found")
-                    self.send_json({"error": "Product not found"}, 404)
-
-            elif path.startswith('/api/cart/'):
-                self.response_time = simulate_latency(CART_LATENCY)
-                simulate_db_call()
-                user_id = path.split('/')[-1]
-                cart = carts.get(user_id, {"items": [], "total": 0})
-                logger.info(f"Retrieved cart for user {user_id}")
-                self.send_json(cart)
-
-            elif path == '/api/categories':
-                self.response_time = simulate_latency(BASE_LATENCY)
-                categories = list(set(p['category'] for p in PRODUCTS))
-                self.send_json({"categories": categories})
-
-            else:
-                self.response_time = simulate_latency(BASE_LATENCY)
-                self.send_json({"error": "Not found", "path": path}, 404)
-
+            return await endpoint(request, *params)
         except Exception as e:
-            self.response_time = time.time() - start_time
-            logger.error(f"ERROR: Request failed - {str(e)}")
-            self.send_json({"error": str(e), "status": "error"}, 500)
-
-    def do_POST(self):
-        start_time = time.time()
-        parsed = urlparse(self.path)
-        path = parsed.path
-
-        try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = json.loads(self.rfile.read(content_length)) if content_length > 0 else {}
-
-            if path.startswith('/api/cart/'):
-                self.response_time = simulate_latency(CART_LATENCY)
-                simulate_db_call()
-                parts = path.split('/')
-                user_id = parts[3]
-
-                if len(parts) > 4 and parts[4] == 'add':
-                    product_id = body.get('product_id')
-                    quantity = body.get('quantity', 1)
-                    product = next((p for p in PRODUCTS if p['id'] == product_id), None)
-                    if product:
-                        if user_id not in carts:
-                            carts[user_id] = {"items": [], "total": 0}
-                        carts[user_id]["items"].append({
-                            "product": product,
-                            "quantity": quantity
-                        })
-                        carts[user_id]["total"] += product["price"] * quantity
-                        logger.info(f"Added product {product_id} to cart for user {user_id}")
-                        self.send_json(carts[user_id])
-                    else:
-                        self.send_json({"error": "Product not found"}, 404)
-                else:
-                    self.send_json({"error": "Invalid cart operation"}, 400)
-
-            elif path == '/api/checkout':
-                self.response_time = simulate_latency(CHECKOUT_LATENCY)
-                simulate_db_call()
-                simulate_payment()
-                user_id = body.get('user_id')
-                cart = carts.get(user_id, {"items": [], "total": 0})
-                if cart["items"]:
-                    order_id = f"ORD-{random.randint(10000, 99999)}"
-                    logger.info(f"Checkout successful for user {user_id}, order {order_id}")
-                    carts[user_id] = {"items": [], "total": 0}
-                    self.send_json({
-                        "order_id": order_id,
-                        "status": "confirmed",
-                        "total": cart["total"],
-                        "items_count": len(cart["items"])
-                    })
-                else:
-                    logger.warning(f"Checkout failed - empty cart for user {user_id}")
-                    self.send_json({"error": "Cart is empty"}, 400)
-
-            else:
-                self.response_time = simulate_latency(BASE_LATENCY)
-                self.send_json({"error": "Not found"}, 404)
-
-        except Exception as e:
-            self.response_time = time.time() - start_time
-            logger.error(f"ERROR: Request failed - {str(e)}")
-            self.send_json({"error": str(e), "status": "error"}, 500)
-
-    def log_message(self, format, *args):
-        logger.info(f"{self.client_address[0]} - {args[0]}")
+            logger.error("ERROR: Request failed - %s", e)
+            return send_json_bytes(ERROR_TEMPLATE % orjson.dumps(str(e)), time.time() - start_time, 500)
+    return wrapper
+
+
+async def index(request):
+    """Serve frontend"""
+    if INDEX_HTML is not None:
+        return Response(INDEX_HTML, media_type='text/html')
+    # Fallback to health if no frontend
+    return await health(request)
+
+
+@handle_errors
+async def health(request):
+    response_time = await simulate_latency(BASE_LATENCY)
+    return send_json_bytes(HEALTH_TEMPLATE % utc_timestamp(), response_time)
+
+
+@handle_errors
+async def list_products(request):
+    response_time = await simulate_latency(PRODUCT_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    count, body = encode_products_response(get_category(request.scope['query_string']) or None)
+    logger.info("Retrieved %d products", count)
+    return send_json_bytes(body, response_time)
+
+
+@handle_errors
+async def get_product(request, product_id):
+    response_time = await simulate_latency(PRODUCT_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    product_id = int(product_id)
+    body = PRODUCT_JSON_BY_ID.get(product_id)
+    if body:
+        logger.info("Retrieved product %s", product_id)
+        return send_json_bytes(body, response_time)
+    logger.warning("Product %s not found", product_id)
+    return send_json_bytes(PRODUCT_NOT_FOUND_JSON, response_time, 404)
+
+
+@handle_errors
+async def get_cart(request, user_id):
+    response_time = await simulate_latency(CART_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    body = await CART_STORE.get(user_id)
+    logger.info("Retrieved cart for user %s", user_id)
+    return send_json_bytes(body, response_time)
+
+
+@handle_errors
+async def list_categories(request):
+    response_time = await simulate_latency(BASE_LATENCY)
+    return send_json_bytes(CATEGORIES_JSON, response_time)
+
+
+@handle_errors
+async def add_to_cart(request, user_id):
+    body = await read_json(request)
+    response_time = await simulate_latency(CART_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    product_id = body.get('product_id')
+    quantity = body.get('quantity', 1)
+    # Unhashable ids (lists, objects) would make the dict lookup raise
+    product = PRODUCTS_BY_ID.get(product_id) if isinstance(product_id, int) else None
+    if not valid_quantity(quantity):
+        return send_json_bytes(INVALID_QUANTITY_JSON, response_time, 400)
+    if product:
+        cart_body = await CART_STORE.add(user_id, [(product, quantity)])
+        logger.info("Added product %s to cart for user %s", product_id, user_id)
+        return send_json_bytes(cart_body, response_time)
+    return send_json_bytes(PRODUCT_NOT_FOUND_JSON, response_time, 404)
+
+
+@handle_errors
+async def bulk_add_to_cart(request, user_id):
+    """Add several items with one simulated DB round-trip"""
+    body = await read_json(request)
+    response_time = await simulate_latency(CART_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    items = body.get('items')
+    if not items or not isinstance(items, list):
+        return send_json_bytes(NO_ITEMS_JSON, response_time, 400)
+    if not all(isinstance(item, dict) and isinstance(item.get('product_id'), int) for item in items):
+        return send_json_bytes(INVALID_ITEMS_JSON, response_time, 400)
+    if not all(valid_quantity(item.get('quantity', 1)) for item in items):
+        return send_json_bytes(INVALID_QUANTITY_JSON, response_time, 400)
+    lines = []
+    missing = []
+    for item in items:
+        product_id = item.get('product_id')
+        product = PRODUCTS_BY_ID.get(product_id)
+        if product:
+            lines.append((product, item.get('quantity', 1)))
+        else:
+            missing.append(product_id)
+    if not lines:
+        return send_json_bytes(BULK_NOT_FOUND_TEMPLATE % orjson.dumps(missing), response_time, 404)
+    cart_body = await CART_STORE.add(user_id, lines)
+    logger.info("Added %d products to cart for user %s", len(lines), user_id)
+    # Extend the cart body with the ids that were skipped
+    return send_json_bytes(cart_body[:-1] + b',"missing":' + orjson.dumps(missing) + b'}', response_time)
+
+
+@handle_errors
+async def invalid_cart_operation(request, user_id):
+    response_time = await simulate_latency(CART_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    return send_json_bytes(INVALID_CART_OPERATION_JSON, response_time, 400)
+
+
+@handle_errors
+async def checkout(request):
+    body = await read_json(request)
+    response_time = await simulate_latency(CHECKOUT_LATENCY)
+    if not simulate_db_call():
+        return send_json_bytes(DB_FAILED_JSON, response_time, 500)
+    if not simulate_payment():
+        return send_json_bytes(PAYMENT_FAILED_JSON, response_time, 500)
+    user_id = body.get('user_id')
+    order = await CART_STORE.checkout(user_id)
+    if order:
+        items_count, total_cents = order
+        order_number = random.randint(10000, 99999)
+        logger.info("Checkout successful for user %s, order ORD-%d", user_id, order_number)
+        return send_json_bytes(CHECKOUT_TEMPLATE % (
+            order_number, format_cents(total_cents), items_count
+        ), response_time)
+    logger.warning("Checkout failed - empty cart for user %s", user_id)
+    return send_json_bytes(CART_EMPTY_JSON, response_time, 400)
+
+
+@handle_errors
+async def not_found(request):
+    response_time = await simulate_latency(BASE_LATENCY)
+    if request.method == 'POST':
+        return send_json_bytes(NOT_FOUND_JSON, response_time, 404)
+    # orjson.dumps quotes and escapes the user-controlled path
+    return send_json_bytes(NOT_FOUND_TEMPLATE % orjson.dumps(request.scope['path']), response_time, 404)
+
+
+async def preflight(request):
+    """Handle CORS preflight requests"""
+    return Response(status_code=200, headers={
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+    })
+
+
+# Route table: '{}' segments are passed to the endpoint positionally and a
+# trailing '*' matches any remaining segments
+ROUTES = {
+    ('GET', '/'): index,
+    ('GET', '/health'): health,
+    ('GET', '/api/products'): list_products,
+    ('GET', '/api/products/{}'): get_product,
+    ('GET', '/api/cart/{}'): get_cart,
+    ('GET', '/api/categories'): list_categories,
+    ('GET', '/*'): not_found,
+    ('POST', '/api/cart/{}/add'): add_to_cart,
+    ('POST', '/api/cart/{}/add_bulk'): bulk_add_to_cart,
+    ('POST', '/api/cart/{}'): invalid_cart_operation,
+    ('POST', '/api/cart/{}/*'): invalid_cart_operation,
+    ('POST', '/api/checkout'): checkout,
+    ('POST', '/*'): not_found,
+    ('OPTIONS', '/*'): preflight,
+}
+
+PARAM = object()
+WILDCARD = object()
+ENDPOINT = object()
+
+
+def split_path(path):
+    return path[1:].split('/') if path != '/' else ()
+
+
+def compile_routes(routes):
+    """Build a per-method segment tree so dispatch is one dict hop per segment"""
+    tree = {}
+    for (method, pattern), endpoint in routes.items():
+        node = tree.setdefault(method, {})
+        for segment in split_path(pattern):
+            key = PARAM if segment == '{}' else WILDCARD if segment == '*' else segment
+            node = node.setdefault(key, {})
+        node[ENDPOINT] = endpoint
+    return tree
+
+
+ROUTE_TREE = compile_routes(ROUTES)
+
+
+def match_route(method, path):
+    """Return (endpoint, params) for a request, or (None, ()) if nothing matches"""
+    node = ROUTE_TREE.get('GET' if method == 'HEAD' else method)
+    if node is None:
+        return None, ()
+    params = []
+    fallback = (None, ())
+    for segment in split_path(path):
+        if WILDCARD in node:
+            fallback = node[WILDCARD][ENDPOINT], tuple(params)
+        child = node.get(segment)
+        if child is None:
+            child = node.get(PARAM)
+            if child is None:
+                return fallback
+            params.append(segment)
+        node = child
+    if ENDPOINT in node:
+        return node[ENDPOINT], tuple(params)
+    if WILDCARD in node:
+        return node[WILDCARD][ENDPOINT], tuple(params)
+    return fallback
+
+
+async def dispatch(request):
+    endpoint, params = match_route(request.method, request.scope['path'])
+    if endpoint is None:
+        return Response(status_code=405)
+    return await endpoint(request, *params)
+
+
+app = Starlette(routes=[Route('/{path:path}', dispatch, methods=list(ROUTE_TREE))])
 
 
 if __name__ == '__main__':
-    logger.info(f"Starting Shopping App on port 8080")
-    logger.info(f"Chaos Mode: {CHAOS_MODE}, Latency Multiplier: {CHAOS_MULTIPLIER}x")
-    HTTPServer(('0.0.0.0', 8080), ShoppingHandler).serve_forever()
+    logger.info("Starting Shopping App on port 8080")
+    logger.info("Chaos Mode: %s, Latency Multiplier: %sx", CHAOS_MODE, CHAOS_MULTIPLIER)
+    workers = WORKERS
+    if workers > 1 and not REDIS_HOST:
+        logger.warning("WEB_CONCURRENCY=%d requires REDIS_HOST for shared carts, running 1 worker", workers)
+        workers = 1
+    # Worker processes import the app by name; log_config=None routes
+    # uvicorn's access logs through the root logger above
+    uvicorn.run('app:app' if workers > 1 else app, host='0.0.0.0', port=8080, loop='uvloop',
+                http='httptools', workers=workers, timeout_keep_alive=KEEP_ALIVE_TIMEOUT, log_config=None)